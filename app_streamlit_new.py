@@ -5,12 +5,15 @@ from utils.visualization import setup_page
 from services.analysis_service import AnalysisService
 from services.openai_service import OpenAIService
 from config.settings import setup_session_state
+from services.session_manager import get_session_manager
 
 def main():
     setup_page()
     
     # Initialize session state
     setup_session_state()
+    session_manager = get_session_manager()
+    session_manager.track()
     
     openai_service = OpenAIService()
     if not openai_service.setup_api_key():
@@ -51,6 +54,8 @@ def main():
         except Exception as e:
             st.error(f"❌ An error occurred: {str(e)}")
 
+    display_memory_usage(session_manager)
+
 def display_data_preview(df):
     with st.expander("🔍 Preview Your Data", expanded=True):
         col1, col2 = st.columns([2, 1])
@@ -60,5 +65,17 @@ def display_data_preview(df):
             st.write("📊 Data Overview")
             st.info(f"Rows: {df.shape[0]}\nColumns: {df.shape[1]}")
 
+def display_memory_usage(session_manager):
+    usage = session_manager.usage()
+    with st.sidebar:
+        st.subheader("Memory Usage")
+        st.metric("This Session", f"{usage['session_bytes'] / 1024 / 1024:.1f} MB")
+        st.metric("All Sessions", f"{usage['global_bytes'] / 1024 / 1024:.1f} MB")
+        st.caption(
+            f"Spilled to disk: {usage['session_spilled_bytes'] / 1024 / 1024:.1f} MB "
+            f"(all sessions: {usage['global_spilled_bytes'] / 1024 / 1024:.1f} MB) · "
+            f"Active sessions: {usage['active_sessions']}"
+        )
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,5 +1,13 @@
+import os
 import streamlit as st
 
+# Session memory budgets (overridable through environment variables)
+SESSION_MEMORY_BUDGET_MB = float(os.environ.get("SESSION_MEMORY_BUDGET_MB", 64))
+GLOBAL_MEMORY_BUDGET_MB = float(os.environ.get("GLOBAL_MEMORY_BUDGET_MB", 1024))
+SESSION_IDLE_TIMEOUT_SECONDS = int(os.environ.get("SESSION_IDLE_TIMEOUT_SECONDS", 30 * 60))
+# Defaults to a private per-process directory under the system temp directory
+SPILL_DIRECTORY = os.environ.get("SPILL_DIRECTORY")
+
 def setup_session_state():
     """Initialize session state variables."""
     if 'openai_api_key' not in st.session_state:
@@ -19,4 +27,6 @@ def setup_session_state():
     if 'summary_data' not in st.session_state:
         st.session_state.summary_data = None
     if 'graph_data' not in st.session_state:
-        st.session_state.graph_data = None
\ No newline at end of file
+        st.session_state.graph_data = None
+    if 'code' not in st.session_state:
+        st.session_state.code = None
\ No newline at end of file
@@ -8,11 +8,13 @@ import numpy as np
 from datetime import datetime as dt
 import re
 from contextlib import redirect_stdout, redirect_stderr
+from services.session_manager import get_session_manager
 
 class AnalysisService:
     def __init__(self, openai_service, df):
         self.openai_service = openai_service
         self.df = df
+        self.session_manager = get_session_manager()
         
     def run_analysis_pipeline(self, user_query):
         """Run the complete analysis pipeline."""
@@ -34,6 +36,8 @@ class AnalysisService:
             if st.session_state.summary_complete:
                 self._generate_questions()
 
+        self.session_manager.track()
+
 
     def _generate_analysis_plan(self):
         """Generate analysis plan."""
@@ -261,7 +265,7 @@ class AnalysisService:
             **Provide only the Correct Python Code which can be run with the `exec()`. Do not include any additional explanations or commentary**
             """
 
-            response = self.openai_service.create_completion_code_generation(task_execution_prompt,st.session_state.task_plan,available_columns=', '.join(self.df.columns),column_data_types="\n".join([f"- **{col}**: {dtype}" for col, dtype in self.df.dtypes.items()]),data_frame_preview="\n".join([f"- **{col}**: {dtype}" for col, dtype in self.df.items()]))
+            response = self.openai_service.create_completion_code_generation(task_execution_prompt,self.session_manager.load("task_plan"),available_columns=', '.join(self.df.columns),column_data_types="\n".join([f"- **{col}**: {dtype}" for col, dtype in self.df.dtypes.items()]),data_frame_preview="\n".join([f"- **{col}**: {dtype}" for col, dtype in self.df.items()]))
                         
             time.sleep(1.5) 
             status.update(label="✅ Code Generated!", state="complete")
@@ -285,7 +289,7 @@ class AnalysisService:
     def _generate_analysis(self):
 
         with st.status("Executing Code") as status:
-            output_dict, error = self._execute_task_code(st.session_state.code)
+            output_dict, error = self._execute_task_code(self.session_manager.load("code"))
 
             if error:
                 st.error(f"❌ An error occurred during code execution: {str(error)}")
@@ -399,7 +403,7 @@ class AnalysisService:
             [Brief visualization analysis]
             """
             # "\n".join([f"- **{col}**: {value}" for col, value in st.session_state.summary_data.items()])
-            response = self.openai_service.create_completion_summary(summary_prompt,st.session_state.summary_data,st.session_state.graph_data)
+            response = self.openai_service.create_completion_summary(summary_prompt,self.session_manager.load("summary_data"),self.session_manager.load("graph_data"))
                         
             time.sleep(1)
             status.update(label="✅ Insights Generated!", state="complete")
@@ -0,0 +1,397 @@
+import streamlit as st
+import os
+import sys
+import gzip
+import stat
+import uuid
+import socket
+import atexit
+import pickle
+import shutil
+import logging
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from config.settings import (
+    SESSION_MEMORY_BUDGET_MB,
+    GLOBAL_MEMORY_BUDGET_MB,
+    SESSION_IDLE_TIMEOUT_SECONDS,
+    SPILL_DIRECTORY,
+)
+
+logger = logging.getLogger(__name__)
+
+# Session state keys holding analysis results that may be spilled to disk
+MANAGED_KEYS = ("summary_data", "graph_data", "code", "task_plan")
+
+# Prefix of the per-process spill directories, followed by the host name and process id
+SPILL_PREFIX = "csv_analyzer_spill_"
+
+# File inside each spill directory that its owning process keeps locked while running
+SPILL_LOCK_FILE = "owner.lock"
+
+
+class SpilledValue:
+    """Placeholder left in session state for a value moved to the spill store."""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+
+def estimate_size(obj, _seen=None):
+    """Estimate the bytes held by a session state value."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, SpilledValue):
+        return sys.getsizeof(obj)
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(
+            estimate_size(key, _seen) + estimate_size(value, _seen) for key, value in obj.items()
+        )
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return sys.getsizeof(obj) + sum(estimate_size(item, _seen) for item in obj)
+    return sys.getsizeof(obj)
+
+
+def _is_private_directory(path):
+    """Check that path is a real directory owned by and only accessible to the current user."""
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        return False
+    if hasattr(os, "getuid") and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        return False
+    return True
+
+
+def _host_id():
+    return "".join(c if c.isalnum() or c == "-" else "-" for c in socket.gethostname()) or "localhost"
+
+
+def _lock_spill_directory(directory):
+    """Lock a spill directory for as long as the returned file stays open."""
+    if fcntl is None:
+        return None
+    lock_file = open(os.path.join(directory, SPILL_LOCK_FILE), "w")
+    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return lock_file
+
+
+def _remove_stale_spill_directories(root):
+    """Remove spill directories of this host whose owning process no longer holds their lock."""
+    if fcntl is None:
+        return
+    # Directories of other hosts sharing the same volume are never touched
+    prefix = f"{SPILL_PREFIX}{_host_id()}_"
+    for name in os.listdir(root):
+        if not name.startswith(prefix):
+            continue
+        path = os.path.join(root, name)
+        try:
+            if not _is_private_directory(path):
+                continue
+            with open(os.path.join(path, SPILL_LOCK_FILE), "r") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            # Still locked by a running process, or not yet locked by one that is starting up
+            continue
+
+
+class SessionResourceManager:
+    """Track, bound and spill the analysis results held in each user session."""
+
+    def __init__(self, session_budget_mb, global_budget_mb, idle_timeout, spill_root=None):
+        self.session_budget = int(session_budget_mb * 1024 * 1024)
+        self.global_budget = int(global_budget_mb * 1024 * 1024)
+        self.idle_timeout = idle_timeout
+        self.spill_directory, self.spill_lock = self._create_spill_directory(spill_root)
+        self.sessions = {}
+        self.spilling = set()
+        self.lock = threading.RLock()
+
+    def track(self):
+        """Measure the current session, enforce budgets and evict abandoned sessions."""
+        try:
+            self._track()
+        except Exception:
+            logger.exception("Failed to track session resources")
+
+    def load(self, key):
+        """Return a managed session state value, reading it back from disk if spilled."""
+        session_id, state = self._current_session()
+        spilled = state[key]
+        if not isinstance(spilled, SpilledValue):
+            return spilled
+
+        try:
+            with gzip.open(spilled.path, "rb") as f:
+                value = pickle.load(f)
+        except Exception as e:
+            logger.error("Could not restore %r of session %s from %s: %s", key, session_id, spilled.path, e)
+            value = None
+
+        with self.lock:
+            if state[key] is spilled:
+                state[key] = value
+                entry = self.sessions.get(session_id)
+                if entry is not None:
+                    entry["spilled"].pop(key, None)
+                    if value is not None:
+                        entry["measured"][key] = (value, spilled.size)
+                        entry["memory_bytes"] += spilled.size
+        self._remove_file(spilled.path)
+        return value
+
+    def usage(self):
+        """Return the bytes held in memory and on disk for the current and all sessions."""
+        session_id, _ = self._current_session()
+        with self.lock:
+            live = self._live_entries()
+            entry = live.get(session_id)
+            return {
+                "session_bytes": entry["memory_bytes"] if entry else 0,
+                "session_spilled_bytes": self._spilled_bytes(entry) if entry else 0,
+                "global_bytes": sum(e["memory_bytes"] for e in live.values()),
+                "global_spilled_bytes": sum(self._spilled_bytes(e) for e in live.values()),
+                "active_sessions": len(live),
+            }
+
+    def _track(self):
+        session_id, state = self._current_session()
+        with self.lock:
+            entry = self.sessions.get(session_id)
+            if entry is None or entry["state"] is not state:
+                entry = {
+                    "state": state,
+                    "last_seen": 0.0,
+                    "memory_bytes": 0,
+                    "measured": {},
+                    "spilled": {},
+                    "unspillable": {},
+                }
+                self.sessions[session_id] = entry
+            entry["last_seen"] = time.time()
+
+            stale_files = self._measure(entry)
+            stale_directories = self._evict_abandoned_sessions()
+            candidates = self._select_for_session_budget(session_id, entry)
+            self.spilling.update((sid, key) for sid, _, key, _, _ in candidates)
+            global_candidates = self._select_for_global_budget()
+            self.spilling.update((sid, key) for sid, _, key, _, _ in global_candidates)
+            candidates += global_candidates
+
+        for path in stale_files:
+            self._remove_file(path)
+        for directory in stale_directories:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        # Compression and disk writes happen outside the lock so other sessions are not stalled
+        for session_id, entry, key, value, size in candidates:
+            path = self._write_spill(session_id, key, value)
+            self._swap_in_placeholder(session_id, entry, key, value, size, path)
+
+    def _current_session(self):
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            raise RuntimeError("Session resources can only be tracked from a running Streamlit script.")
+        # ctx.session_state is a wrapper created anew for every script run; the
+        # SessionState underneath it lives as long as the session itself
+        return ctx.session_id, getattr(ctx.session_state, "_state", ctx.session_state)
+
+    def _session_alive(self, session_id):
+        """Check whether the Streamlit runtime still knows the session."""
+        if not runtime.exists():
+            return True
+        return runtime.get_instance()._session_mgr.get_session_info(session_id) is not None
+
+    def _create_spill_directory(self, spill_root):
+        if spill_root:
+            os.makedirs(spill_root, mode=0o700, exist_ok=True)
+            if not _is_private_directory(spill_root):
+                raise RuntimeError(
+                    f"Spill directory {spill_root} must be owned by the current user and not accessible to others."
+                )
+        else:
+            spill_root = tempfile.gettempdir()
+
+        _remove_stale_spill_directories(spill_root)
+        spill_directory = tempfile.mkdtemp(prefix=f"{SPILL_PREFIX}{_host_id()}_{os.getpid()}_", dir=spill_root)
+        spill_lock = _lock_spill_directory(spill_directory)
+        atexit.register(shutil.rmtree, spill_directory, ignore_errors=True)
+        return spill_directory, spill_lock
+
+    def _live_entries(self):
+        return {sid: e for sid, e in self.sessions.items() if self._session_alive(sid)}
+
+    def _measure(self, entry):
+        """Update the in-memory size of a session, re-measuring only reassigned values."""
+        state = entry["state"]
+        stale_files = []
+        memory_bytes = 0
+        for key in MANAGED_KEYS:
+            value = state[key] if key in state else None
+
+            spilled = entry["spilled"].get(key)
+            if spilled is not None and value is not spilled:
+                # The value was overwritten by a newer analysis, so the old spill is stale
+                stale_files.append(spilled.path)
+                del entry["spilled"][key]
+            if key in entry["unspillable"] and entry["unspillable"][key] is not value:
+                del entry["unspillable"][key]
+
+            if value is None or isinstance(value, SpilledValue):
+                entry["measured"].pop(key, None)
+                continue
+
+            measured = entry["measured"].get(key)
+            if measured is None or measured[0] is not value:
+                measured = (value, estimate_size(value))
+                entry["measured"][key] = measured
+            memory_bytes += measured[1]
+        entry["memory_bytes"] = memory_bytes
+        return stale_files
+
+    def _spill_candidates(self, session_id, entry):
+        """Return the spillable values of a session as (size, key, value), largest first."""
+        state = entry["state"]
+        candidates = []
+        for key, (value, size) in entry["measured"].items():
+            if (session_id, key) in self.spilling or entry["unspillable"].get(key) is value:
+                continue
+            if key not in state or state[key] is not value:
+                continue
+            candidates.append((size, key, value))
+        return sorted(candidates, key=lambda candidate: candidate[0], reverse=True)
+
+    def _select_for_session_budget(self, session_id, entry):
+        selected = []
+        excess = entry["memory_bytes"] - self.session_budget
+        for size, key, value in self._spill_candidates(session_id, entry):
+            if excess <= 0:
+                break
+            selected.append((session_id, entry, key, value, size))
+            excess -= size
+        return selected
+
+    def _select_for_global_budget(self):
+        live = self._live_entries()
+        total = sum(e["memory_bytes"] for e in live.values())
+        total -= sum(
+            e["measured"][key][1]
+            for sid, e in live.items()
+            for key in e["measured"]
+            if (sid, key) in self.spilling
+        )
+
+        # Spill the coldest sessions first until the process is back under budget
+        selected = []
+        for session_id, entry in sorted(live.items(), key=lambda item: item[1]["last_seen"]):
+            for size, key, value in self._spill_candidates(session_id, entry):
+                if total <= self.global_budget:
+                    return selected
+                selected.append((session_id, entry, key, value, size))
+                total -= size
+        return selected
+
+    def _write_spill(self, session_id, key, value):
+        """Write a value to the spill store, returning its path or None if it could not be written."""
+        session_directory = os.path.join(self.spill_directory, session_id)
+        path = os.path.join(session_directory, f"{key}-{uuid.uuid4().hex}.pkl.gz")
+        try:
+            os.makedirs(session_directory, mode=0o700, exist_ok=True)
+            with gzip.open(path, "wb", compresslevel=6) as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            # Generated code can put anything in output_dict, including values that cannot be pickled
+            logger.warning("Could not spill %r of session %s to disk, keeping it in memory: %s", key, session_id, e)
+            self._remove_file(path)
+            return None
+        return path
+
+    def _swap_in_placeholder(self, session_id, entry, key, value, size, path):
+        with self.lock:
+            self.spilling.discard((session_id, key))
+            state = entry["state"]
+            if path is None:
+                entry["unspillable"][key] = value
+                return
+            if self.sessions.get(session_id) is not entry:
+                # The session was evicted while its value was being written
+                self._remove_file(path)
+                try:
+                    os.rmdir(os.path.dirname(path))
+                except OSError:
+                    pass
+                return
+            # Another thread may have assigned a newer result while this one was being written
+            if key not in state or state[key] is not value:
+                self._remove_file(path)
+                return
+
+            placeholder = SpilledValue(path, size)
+            state[key] = placeholder
+            entry["spilled"][key] = placeholder
+            entry["measured"].pop(key, None)
+            entry["memory_bytes"] -= size
+
+    def _evict_abandoned_sessions(self):
+        """Drop dead and idle sessions, returning their spill directories for removal."""
+        now = time.time()
+        directories = []
+        for session_id, entry in list(self.sessions.items()):
+            alive = self._session_alive(session_id)
+            if alive and now - entry["last_seen"] < self.idle_timeout:
+                continue
+            if alive:
+                state = entry["state"]
+                for key in MANAGED_KEYS:
+                    if key in state:
+                        state[key] = None
+            directories.append(os.path.join(self.spill_directory, session_id))
+            del self.sessions[session_id]
+        return directories
+
+    def _spilled_bytes(self, entry):
+        total = 0
+        for spilled in entry["spilled"].values():
+            try:
+                total += os.path.getsize(spilled.path)
+            except OSError:
+                continue
+        return total
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@st.cache_resource
+def get_session_manager():
+    """Return the process-wide session resource manager."""
+    return SessionResourceManager(
+        SESSION_MEMORY_BUDGET_MB,
+        GLOBAL_MEMORY_BUDGET_MB,
+        SESSION_IDLE_TIMEOUT_SECONDS,
+        SPILL_DIRECTORY,
+    )
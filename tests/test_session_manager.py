@@ -0,0 +1,267 @@
+import os
+import gc
+import fcntl
+import logging
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+from services import session_manager
+from services.session_manager import (
+    MANAGED_KEYS,
+    SPILL_LOCK_FILE,
+    SPILL_PREFIX,
+    SessionResourceManager,
+    SpilledValue,
+    _host_id,
+)
+
+
+class FakeSafeSessionState:
+    """Per-run wrapper around a session's state, like Streamlit's SafeSessionState."""
+
+    def __init__(self, state):
+        self._state = state
+
+    def __getitem__(self, key):
+        return self._state[key]
+
+    def __setitem__(self, key, value):
+        self._state[key] = value
+
+    def __contains__(self, key):
+        return key in self._state
+
+
+class FakeSessions:
+    """Switch the session the manager considers current, wrapping its state anew for every run."""
+
+    def __init__(self, monkeypatch, manager):
+        self.states = {}
+        self.closed = set()
+        self.ctx = None
+        monkeypatch.setattr(session_manager, "get_script_run_ctx", lambda: self.ctx)
+        monkeypatch.setattr(manager, "_session_alive", lambda session_id: session_id not in self.closed)
+
+    def use(self, session_id):
+        state = self.states.setdefault(session_id, {key: None for key in MANAGED_KEYS})
+        self.ctx = SimpleNamespace(session_id=session_id, session_state=FakeSafeSessionState(state))
+        gc.collect()
+        return state
+
+    def close(self, session_id):
+        self.closed.add(session_id)
+
+
+def frame(rows):
+    return pd.DataFrame({"value": range(rows)})
+
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return SessionResourceManager(session_budget_mb=1, global_budget_mb=100, idle_timeout=60, spill_root=str(tmp_path))
+
+
+@pytest.fixture
+def sessions(monkeypatch, manager):
+    return FakeSessions(monkeypatch, manager)
+
+
+def test_spills_over_session_budget_and_loads_back(manager, sessions):
+    state = sessions.use("a")
+    state["summary_data"] = {"Result": frame(200_000)}
+    state["code"] = "output_dict = {}"
+
+    manager.track()
+
+    assert isinstance(state["summary_data"], SpilledValue)
+    assert os.path.exists(state["summary_data"].path)
+    assert state["code"] == "output_dict = {}"
+    assert manager.usage()["session_bytes"] < MB
+    assert manager.usage()["session_spilled_bytes"] > 0
+
+    path = state["summary_data"].path
+    loaded = manager.load("summary_data")
+    pd.testing.assert_frame_equal(loaded["Result"], frame(200_000))
+    assert state["summary_data"] is loaded
+    assert not os.path.exists(path)
+
+
+def test_global_budget_spills_coldest_session_first(manager, sessions):
+    manager.session_budget = 10 * MB
+    manager.global_budget = 3 * MB
+
+    for session_id in ("cold", "warm"):
+        sessions.use(session_id)["summary_data"] = {"Result": frame(150_000)}
+        manager.track()
+    manager.sessions["cold"]["last_seen"] -= 10
+
+    sessions.use("hot")["summary_data"] = {"Result": frame(150_000)}
+    manager.track()
+
+    assert isinstance(sessions.states["cold"]["summary_data"], SpilledValue)
+    assert not isinstance(sessions.states["warm"]["summary_data"], SpilledValue)
+    assert not isinstance(sessions.states["hot"]["summary_data"], SpilledValue)
+    assert manager.usage()["global_bytes"] <= manager.global_budget
+
+
+def test_idle_sessions_are_evicted_with_their_spill_directory(manager, sessions):
+    idle = sessions.use("idle")
+    idle["summary_data"] = {"Result": frame(200_000)}
+    manager.track()
+    spill_directory = os.path.dirname(idle["summary_data"].path)
+    assert os.path.isdir(spill_directory)
+
+    manager.sessions["idle"]["last_seen"] -= manager.idle_timeout + 1
+    sessions.use("active")
+    manager.track()
+
+    assert "idle" not in manager.sessions
+    assert idle["summary_data"] is None
+    assert not os.path.exists(spill_directory)
+    assert manager.usage()["active_sessions"] == 1
+
+
+def test_closed_sessions_do_not_count_towards_budget(manager, sessions):
+    manager.session_budget = 10 * MB
+    manager.global_budget = 2 * MB
+    sessions.use("gone")["summary_data"] = {"Result": frame(150_000)}
+    manager.track()
+    sessions.close("gone")
+
+    state = sessions.use("live")
+    state["summary_data"] = {"Result": frame(150_000)}
+    manager.track()
+
+    assert "gone" not in manager.sessions
+    assert not isinstance(state["summary_data"], SpilledValue)
+
+
+def test_spilled_value_survives_other_sessions_after_run_ends(manager, sessions):
+    sessions.use("a")["summary_data"] = {"Result": frame(200_000)}
+    manager.track()
+    assert isinstance(sessions.states["a"]["summary_data"], SpilledValue)
+
+    sessions.use("b")["code"] = "output_dict = {}"
+    manager.track()
+    assert "a" in manager.sessions
+    assert manager.usage()["active_sessions"] == 2
+    assert manager.usage()["global_spilled_bytes"] > 0
+
+    sessions.use("a")
+    manager.track()
+    assert manager.usage()["session_spilled_bytes"] > 0
+    pd.testing.assert_frame_equal(manager.load("summary_data")["Result"], frame(200_000))
+
+
+def test_global_budget_spills_sessions_between_runs(manager, sessions):
+    manager.session_budget = 10 * MB
+    manager.global_budget = 2 * MB
+    sessions.use("cold")["summary_data"] = {"Result": frame(150_000)}
+    manager.track()
+
+    sessions.use("hot")["summary_data"] = {"Result": frame(150_000)}
+    manager.track()
+
+    assert isinstance(sessions.states["cold"]["summary_data"], SpilledValue)
+    assert manager.usage()["global_bytes"] <= manager.global_budget
+
+
+def test_reassigned_value_removes_old_spill_file(manager, sessions):
+    state = sessions.use("a")
+    state["summary_data"] = {"Result": frame(200_000)}
+    manager.track()
+    old_path = state["summary_data"].path
+
+    state = sessions.use("a")
+    state["summary_data"] = {"Result": frame(10)}
+    manager.track()
+
+    assert not os.path.exists(old_path)
+    assert manager.usage()["session_spilled_bytes"] == 0
+
+
+def test_missing_spill_file_is_logged_and_not_raised(manager, sessions, caplog):
+    state = sessions.use("a")
+    state["summary_data"] = {"Result": frame(200_000)}
+    manager.track()
+    os.remove(state["summary_data"].path)
+
+    with caplog.at_level(logging.ERROR, logger=session_manager.__name__):
+        assert manager.load("summary_data") is None
+
+    assert state["summary_data"] is None
+    assert "'summary_data' of session a" in caplog.text
+
+
+def test_unpicklable_value_stays_in_memory(manager, sessions):
+    state = sessions.use("a")
+    values = (value for value in range(10))
+    state["summary_data"] = {"Result": frame(200_000), "Values": values}
+
+    manager.track()
+    manager.track()
+
+    assert state["summary_data"]["Values"] is values
+    assert not any(os.scandir(os.path.join(manager.spill_directory, "a")))
+    assert manager.load("summary_data")["Values"] is values
+
+
+def test_value_reassigned_during_spill_is_kept(manager, sessions):
+    state = sessions.use("a")
+    state["summary_data"] = {"Result": frame(200_000)}
+    newer = {"Result": frame(10)}
+
+    write_spill = manager._write_spill
+
+    def reassign_while_writing(session_id, key, value):
+        path = write_spill(session_id, key, value)
+        state["summary_data"] = newer
+        return path
+
+    manager._write_spill = reassign_while_writing
+    manager.track()
+
+    assert state["summary_data"] is newer
+    assert not any(os.scandir(os.path.join(manager.spill_directory, "a")))
+
+
+def make_spill_directory(root, name, locked_by=None):
+    directory = root / name
+    directory.mkdir(mode=0o700)
+    lock_file = open(directory / SPILL_LOCK_FILE, "w")
+    if locked_by is None:
+        lock_file.close()
+    else:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        locked_by.append(lock_file)
+    return directory
+
+
+def test_spill_directory_is_private_and_only_unlocked_local_directories_are_removed(tmp_path):
+    held_locks = []
+    # A previous container run that had the same pid as this process
+    stale = make_spill_directory(tmp_path, f"{SPILL_PREFIX}{_host_id()}_{os.getpid()}_old")
+    running = make_spill_directory(tmp_path, f"{SPILL_PREFIX}{_host_id()}_1_running", locked_by=held_locks)
+    other_host = make_spill_directory(tmp_path, f"{SPILL_PREFIX}other-replica_1_old")
+
+    manager = SessionResourceManager(1, 100, 60, spill_root=str(tmp_path))
+
+    assert not stale.exists()
+    assert running.exists()
+    assert other_host.exists()
+    assert os.stat(manager.spill_directory).st_mode & 0o077 == 0
+    assert os.path.exists(os.path.join(manager.spill_directory, SPILL_LOCK_FILE))
+    for lock_file in held_locks:
+        lock_file.close()
+
+
+def test_rejects_spill_root_accessible_to_others(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+
+    with pytest.raises(RuntimeError):
+        SessionResourceManager(1, 100, 60, spill_root=str(shared))